@@ -15,17 +15,39 @@ models.json 서명 스크립트
 
 import argparse
 import base64
+import functools
 import hashlib
+import io
 import json
 import sys
+from json.encoder import encode_basestring
 from pathlib import Path
 
 try:
-    from cryptography.hazmat.primitives import serialization
-    from cryptography.hazmat.primitives.asymmetric.ed25519 import Ed25519PrivateKey, Ed25519PublicKey
+    import orjson
 except ImportError:
-    print("cryptography 패키지가 필요합니다: pip install cryptography")
-    sys.exit(1)
+    orjson = None
+
+try:
+    # 선택 의존성: libsodium의 AVX2 Ed25519 경로 (배치 검증용)
+    from nacl.signing import VerifyKey as _NaclVerifyKey
+except ImportError:
+    _NaclVerifyKey = None
+
+def _import_cryptography():
+    """cryptography 지연 import
+
+    OpenSSL 동적 로딩이 ~150ms라서, canonical_json만 쓰거나
+    (update_models.py가 모듈로 import할 때 등) 서명/검증이 없는 경로에선
+    아예 로드하지 않는다.
+    """
+    try:
+        from cryptography.hazmat.primitives import serialization
+        from cryptography.hazmat.primitives.asymmetric.ed25519 import Ed25519PrivateKey
+        return serialization, Ed25519PrivateKey
+    except ImportError:
+        print("cryptography 패키지가 필요합니다: pip install cryptography")
+        sys.exit(1)
 
 
 KEY_DIR = Path(__file__).parent / "keys"
@@ -33,47 +55,155 @@ PRIVATE_KEY_FILE = KEY_DIR / "private_key.pem"
 PUBLIC_KEY_FILE = KEY_DIR / "public_key.pem"
 
 
-def canonical_json(obj):
-    """RFC 8785 JCS 간소화 - 재귀적 키 정렬 + compact"""
-    if isinstance(obj, dict):
-        return '{' + ','.join(
-            json.dumps(k, ensure_ascii=False) + ':' + canonical_json(v)
-            for k, v in sorted(obj.items())
-        ) + '}'
-    elif isinstance(obj, list):
-        return '[' + ','.join(canonical_json(v) for v in obj) + ']'
-    else:
-        return json.dumps(obj, ensure_ascii=False)
+class _Raw(str):
+    """canonical_json 스택에서 그대로 출력할 조각 (값과 구분용)"""
+
+
+class _Close:
+    """공유 컨테이너의 직렬화 구간을 memo에 담기 위한 닫기 마커"""
+    __slots__ = ("obj_id", "start", "bracket")
+
+    def __init__(self, obj_id, start, bracket):
+        self.obj_id = obj_id
+        self.start = start
+        self.bracket = bracket
+
+
+# orjson 경로가 순수 파이썬 경로와 같은 bytes를 내는지 1회만 확인
+_orjson_checked = False
+
+
+def canonical_json(obj) -> bytes:
+    """RFC 8785 JCS 간소화 - 키 정렬 + compact, UTF-8 bytes 반환
+
+    orjson이 있으면 C 구현으로 직렬화 (OPT_SORT_KEYS가 재귀 정렬까지 처리),
+    없으면 순수 파이썬 경로로 폴백. 첫 호출에서 두 경로의 출력이 같은지
+    한 번 검증해서 포맷이 어긋나면 바로 잡아낸다.
+    """
+    if orjson is not None:
+        out = orjson.dumps(obj, option=orjson.OPT_SORT_KEYS)
+        global _orjson_checked
+        if not _orjson_checked:
+            _orjson_checked = True
+            assert out == _canonical_json_py(obj), "orjson canonical JSON 불일치"
+        return out
+    return _canonical_json_py(obj)
+
+
+def _canonical_json_py(obj) -> bytes:
+    """canonical_json의 순수 파이썬 폴백 (반복 방식 인코더)
+
+    같은 dict/list 객체가 manifest 안에 여러 번 등장하면 첫 직렬화
+    결과를 id() 기준 memo에 담아 재사용한다 (정렬+인코딩이 컨테이너당
+    1회로 수렴). 공유가 없는 평범한 manifest에선 사전 탐색 외에 추가
+    비용이 없다.
+    """
+    # 사전 탐색: 두 번 이상 등장하는 컨테이너 id 수집
+    seen = set()
+    shared = set()
+    scan = [obj]
+    while scan:
+        node = scan.pop()
+        if isinstance(node, (dict, list)):
+            nid = id(node)
+            if nid in seen:
+                shared.add(nid)
+                continue
+            seen.add(nid)
+            scan.extend(node.values() if isinstance(node, dict) else node)
+
+    memo = {}
+    buf = io.StringIO()
+    write = buf.write
+    stack = [obj]
+    while stack:
+        item = stack.pop()
+        cls = item.__class__
+        if cls is _Raw:
+            write(item)
+        elif cls is _Close:
+            write(item.bracket)
+            memo[item.obj_id] = buf.getvalue()[item.start:]
+        elif isinstance(item, dict):
+            nid = id(item)
+            if nid in memo:
+                write(memo[nid])
+                continue
+            if nid in shared:
+                stack.append(_Close(nid, buf.tell(), '}'))
+            else:
+                stack.append(_Raw('}'))
+            write('{')
+            items = sorted(item.items())
+            for i in range(len(items) - 1, -1, -1):
+                k, v = items[i]
+                stack.append(v)
+                prefix = ',' if i else ''
+                stack.append(_Raw(prefix + encode_basestring(k) + ':'))
+        elif isinstance(item, list):
+            nid = id(item)
+            if nid in memo:
+                write(memo[nid])
+                continue
+            if nid in shared:
+                stack.append(_Close(nid, buf.tell(), ']'))
+            else:
+                stack.append(_Raw(']'))
+            write('[')
+            for i in range(len(item) - 1, -1, -1):
+                stack.append(item[i])
+                if i:
+                    stack.append(_Raw(','))
+        else:
+            write(json.dumps(item, ensure_ascii=False, separators=(',', ':')))
+    return buf.getvalue().encode('utf-8')
+
+
+@functools.lru_cache(maxsize=1)
+def _load_private_key():
+    """개인키 로드 + 캐시 (PEM/ASN.1 파싱이 서명 자체보다 훨씬 비쌈)"""
+    serialization, _ = _import_cryptography()
+    return serialization.load_pem_private_key(PRIVATE_KEY_FILE.read_bytes(), password=None)
+
+
+@functools.lru_cache(maxsize=1)
+def _load_public_key():
+    """공개키 로드 + 캐시"""
+    serialization, _ = _import_cryptography()
+    return serialization.load_pem_public_key(PUBLIC_KEY_FILE.read_bytes())
 
 
 def generate_keypair():
     """Ed25519 키쌍 생성"""
+    serialization, Ed25519PrivateKey = _import_cryptography()
     KEY_DIR.mkdir(exist_ok=True)
 
     private_key = Ed25519PrivateKey.generate()
     public_key = private_key.public_key()
 
+    # 직렬화는 각각 OpenSSL 왕복이므로 형식별로 한 번만 수행
+    private_pem = private_key.private_bytes(
+        encoding=serialization.Encoding.PEM,
+        format=serialization.PrivateFormat.PKCS8,
+        encryption_algorithm=serialization.NoEncryption()
+    )
+    public_pem = public_key.public_bytes(
+        encoding=serialization.Encoding.PEM,
+        format=serialization.PublicFormat.SubjectPublicKeyInfo
+    )
+    public_key_raw = public_key.public_bytes(
+        encoding=serialization.Encoding.Raw,
+        format=serialization.PublicFormat.Raw
+    )
+
     # 개인키 저장
-    with open(PRIVATE_KEY_FILE, "wb") as f:
-        f.write(private_key.private_bytes(
-            encoding=serialization.Encoding.PEM,
-            format=serialization.PrivateFormat.PKCS8,
-            encryption_algorithm=serialization.NoEncryption()
-        ))
+    PRIVATE_KEY_FILE.write_bytes(private_pem)
 
     # 공개키 저장
-    with open(PUBLIC_KEY_FILE, "wb") as f:
-        f.write(public_key.public_bytes(
-            encoding=serialization.Encoding.PEM,
-            format=serialization.PublicFormat.SubjectPublicKeyInfo
-        ))
+    PUBLIC_KEY_FILE.write_bytes(public_pem)
 
     # 공개키 Base64 (코드에 하드코딩용)
-    public_key_bytes = public_key.public_bytes(
-        encoding=serialization.Encoding.Raw,
-        format=serialization.PublicFormat.Raw
-    )
-    public_key_b64 = base64.b64encode(public_key_bytes).decode()
+    public_key_b64 = base64.b64encode(public_key_raw).decode()
 
     print(f"키 생성 완료!")
     print(f"  개인키: {PRIVATE_KEY_FILE}")
@@ -92,9 +222,8 @@ def sign_manifest(manifest_path: Path):
         print(f"개인키가 없습니다. 먼저 --generate-key를 실행하세요.")
         sys.exit(1)
 
-    # 개인키 로드
-    with open(PRIVATE_KEY_FILE, "rb") as f:
-        private_key = serialization.load_pem_private_key(f.read(), password=None)
+    # 개인키 로드 (캐시됨 - 루프에서 여러 번 서명해도 파싱은 1회)
+    private_key = _load_private_key()
 
     # manifest 로드
     with open(manifest_path, "r", encoding="utf-8") as f:
@@ -103,16 +232,16 @@ def sign_manifest(manifest_path: Path):
     # 서명 대상에서 key_id, signature 제거
     manifest_to_sign = {k: v for k, v in manifest.items() if k not in ("key_id", "signature")}
 
-    # Canonical JSON 생성
+    # Canonical JSON 생성 (UTF-8 bytes)
     canonical = canonical_json(manifest_to_sign)
-    print(f"Canonical JSON:\n{canonical}\n")
+    print(f"Canonical JSON:\n{canonical.decode('utf-8')}\n")
 
     # SHA256 해시 (디버깅용)
-    sha256_hash = hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+    sha256_hash = hashlib.sha256(canonical).hexdigest()
     print(f"SHA256: {sha256_hash}\n")
 
     # 서명
-    signature = private_key.sign(canonical.encode("utf-8"))
+    signature = private_key.sign(canonical)
     signature_b64 = base64.b64encode(signature).decode()
 
     # manifest에 서명 추가
@@ -133,9 +262,8 @@ def verify_manifest(manifest_path: Path):
         print(f"공개키가 없습니다.")
         sys.exit(1)
 
-    # 공개키 로드
-    with open(PUBLIC_KEY_FILE, "rb") as f:
-        public_key = serialization.load_pem_public_key(f.read())
+    # 공개키 로드 (캐시됨)
+    public_key = _load_public_key()
 
     # manifest 로드
     with open(manifest_path, "r", encoding="utf-8") as f:
@@ -150,18 +278,77 @@ def verify_manifest(manifest_path: Path):
     # 검증
     signature = base64.b64decode(signature_b64)
     try:
-        public_key.verify(signature, canonical.encode("utf-8"))
+        public_key.verify(signature, canonical)
         print("서명 검증 성공!")
     except Exception as e:
         print(f"서명 검증 실패: {e}")
         sys.exit(1)
 
 
+def _public_key_raw_bytes() -> bytes:
+    """공개키 PEM에서 raw 32바이트 추출 (cryptography 불필요)
+
+    Ed25519 SubjectPublicKeyInfo DER은 고정 44바이트로, 마지막 32바이트가
+    raw 공개키다.
+    """
+    pem = PUBLIC_KEY_FILE.read_text(encoding="ascii")
+    body = "".join(line for line in pem.splitlines() if not line.startswith("-----"))
+    der = base64.b64decode(body)
+    return der[-32:]
+
+
+def verify_manifests_batch(manifest_paths):
+    """여러 manifest를 한 번에 검증
+
+    PyNaCl이 설치돼 있으면 libsodium의 Ed25519 구현으로 검증한다
+    (VerifyKey 객체 1개를 전체에 재사용; libsodium은 진짜 배치 방정식
+    API는 노출하지 않지만 단건 검증 자체가 빠름). 없으면 cryptography
+    경로로 폴백. 단건 검증은 기존 verify_manifest 그대로.
+    """
+    if not PUBLIC_KEY_FILE.exists():
+        print(f"공개키가 없습니다.")
+        sys.exit(1)
+
+    # (경로, canonical bytes, 서명) 수집
+    triples = []
+    for path in manifest_paths:
+        with open(path, "r", encoding="utf-8") as f:
+            manifest = json.load(f)
+        signature = base64.b64decode(manifest.pop("signature"))
+        manifest.pop("key_id", None)
+        triples.append((path, canonical_json(manifest), signature))
+
+    failed = []
+    if _NaclVerifyKey is not None:
+        verify_key = _NaclVerifyKey(_public_key_raw_bytes())
+        for path, canonical, signature in triples:
+            try:
+                verify_key.verify(canonical, signature)
+            except Exception:
+                # BadSignatureError 외에 잘린/깨진 서명은 ValueError로 옴
+                # - cryptography 폴백과 동일하게 실패로 집계
+                failed.append(path)
+    else:
+        public_key = _load_public_key()
+        for path, canonical, signature in triples:
+            try:
+                public_key.verify(signature, canonical)
+            except Exception:
+                failed.append(path)
+
+    for path in failed:
+        print(f"서명 검증 실패: {path}")
+    if failed:
+        sys.exit(1)
+    print(f"서명 검증 성공! ({len(triples)}개)")
+
+
 def main():
     parser = argparse.ArgumentParser(description="models.json 서명 도구")
     parser.add_argument("--generate-key", action="store_true", help="Ed25519 키쌍 생성")
     parser.add_argument("--sign", type=Path, help="manifest 파일 서명")
     parser.add_argument("--verify", type=Path, help="manifest 서명 검증")
+    parser.add_argument("--verify-batch", type=Path, nargs="+", help="여러 manifest 일괄 검증")
 
     args = parser.parse_args()
 
@@ -171,6 +358,8 @@ def main():
         sign_manifest(args.sign)
     elif args.verify:
         verify_manifest(args.verify)
+    elif args.verify_batch:
+        verify_manifests_batch(args.verify_batch)
     else:
         parser.print_help()
 
@@ -15,62 +15,192 @@
 import hashlib
 import json
 import os
-import re
 import sys
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timezone
 from pathlib import Path
 
+try:
+    # 선택 의존성: 단일 파일도 전 코어로 해싱 (>1GB ONNX에서 유리)
+    from blake3 import blake3
+except ImportError:
+    blake3 = None
+
+# 같은 폴더의 sign_manifest를 모듈로 사용 (서명마다 subprocess로
+# 인터프리터 + OpenSSL을 다시 띄우는 비용 제거)
+sys.path.insert(0, str(Path(__file__).parent))
+import sign_manifest
+
 # 프로젝트 루트
 ROOT_DIR = Path(__file__).parent.parent
 MODELS_DIR = ROOT_DIR / "models"
 MODELS_JSON = ROOT_DIR / "models.json"
 README_FILE = ROOT_DIR / "README.md"
 GITHUB_BASE_URL = "https://raw.githubusercontent.com/happymaj11r/openpilot-models/main/models"
+HASH_CACHE_FILE = Path(__file__).parent / ".hashcache.json"
 
 # 필수 파일
 REQUIRED_FILES = ["driving_policy.onnx", "driving_vision.onnx"]
 
-
-def calculate_sha256(filepath: Path) -> str:
-    """파일의 SHA256 해시 계산"""
-    sha256 = hashlib.sha256()
-    with open(filepath, "rb") as f:
-        for chunk in iter(lambda: f.read(8192), b""):
-            sha256.update(chunk)
+# hashlib이 OpenSSL 기반인지 확인 (OpenSSL이어야 SHA-NI/ARMv8 SHA2 가속을 탐)
+assert "sha256" in hashlib.algorithms_guaranteed
+try:
+    import _hashlib
+    if getattr(_hashlib, "openssl_sha256", None) is None:
+        print("경고: hashlib이 OpenSSL 없이 빌드됨 - SHA256 하드웨어 가속 불가", file=sys.stderr)
+except ImportError:
+    print("경고: _hashlib 모듈 없음 - 순수 파이썬 SHA256 폴백 사용 중", file=sys.stderr)
+
+
+def _new_sha256():
+    """SHA256 해시 객체 생성 (무결성 체크섬 용도라 FIPS 래퍼 생략)"""
+    return hashlib.new("sha256", usedforsecurity=False)
+
+
+def calculate_sha256(filepath: str | Path) -> str:
+    """파일의 SHA256 해시 계산
+
+    Python 3.11+의 hashlib.file_digest는 C 레벨 버퍼 루프라서
+    8KB read 루프보다 syscall이 적고 블록마다 GIL을 놓아준다.
+    구버전은 1MB bytearray에 readinto로 채워서 청크당 bytes 할당 없이
+    같은 버퍼를 재사용 (버퍼가 커서 GIL 해제 구간이 호출 오버헤드를
+    압도). buffering=0으로 파이썬 BufferedReader의 이중 복사도 제거.
+    """
+    if hasattr(hashlib, "file_digest"):  # Python 3.11+
+        with open(filepath, "rb") as f:
+            return hashlib.file_digest(f, _new_sha256).hexdigest()
+
+    sha256 = _new_sha256()
+    buf = bytearray(1 << 20)
+    mv = memoryview(buf)
+    with open(filepath, "rb", buffering=0) as f:
+        while (n := f.readinto(buf)):
+            sha256.update(mv[:n])
     return sha256.hexdigest()
 
 
+def calculate_blake3(filepath: str | Path) -> str:
+    """파일의 BLAKE3 해시 계산 (내부 스레드풀로 단일 파일도 멀티코어)"""
+    h = blake3(max_threads=blake3.AUTO)
+    h.update_mmap(str(filepath))
+    return h.hexdigest()
+
+
+def _digest_file(filepath: str | Path) -> dict:
+    """파일 다이제스트 계산 - sha256 필수, blake3는 설치된 경우만"""
+    digests = {"sha256": calculate_sha256(filepath)}
+    if blake3 is not None:
+        digests["blake3"] = calculate_blake3(filepath)
+    return digests
+
+
+def _load_hash_cache() -> dict:
+    """경로별 {size, mtime_ns, sha256} 캐시 로드 (없거나 깨지면 빈 dict)"""
+    try:
+        with open(HASH_CACHE_FILE, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, json.JSONDecodeError):
+        return {}
+
+
+def _save_hash_cache(cache: dict):
+    """캐시를 임시 파일에 쓴 뒤 os.replace로 원자적 교체"""
+    tmp = HASH_CACHE_FILE.with_suffix(".json.tmp")
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(cache, f, ensure_ascii=False)
+    os.replace(tmp, HASH_CACHE_FILE)
+
+
+def hash_model_files(folders: list[Path]) -> dict[str, dict]:
+    """모든 모델 폴더의 ONNX 파일을 스레드풀로 병렬 해싱
+
+    반환값은 경로 문자열 -> {"sha256": ..., "blake3": ...} (blake3는
+    설치 시만). 루프 안에서는 Path 객체 생성 없이 문자열 경로만 쓴다.
+
+    size + mtime_ns가 .hashcache.json과 일치하는 파일은 해싱을 생략하고
+    캐시된 해시를 재사용한다 (변경 없는 재실행 시 해시 비용 0).
+    sha256.update()는 큰 버퍼에서 GIL을 놓아주므로 스레드만으로도
+    디스크 대기와 코어별 SHA 연산이 겹쳐진다.
+
+    참고: isa-l_crypto의 멀티버퍼 SHA256(SHA256_MB)은 코어당 4~16개
+    스트림을 SIMD 레인으로 동시에 처리하지만, 현재 파이썬 바인딩이
+    없다 (PyPI의 isal은 igzip/crc만 래핑). 파일 단위 스레드 병렬화가
+    그 역할을 대신하며, SHA-NI가 있는 CPU에선 스트림당 처리량도 충분.
+    """
+    paths = [
+        folder_str + os.sep + fname
+        for folder_str in map(str, folders)
+        for fname in REQUIRED_FILES
+    ]
+    if not paths:
+        return {}
+
+    cache = _load_hash_cache()
+    hashes = {}
+    stats = {}
+    to_hash = []
+    for p in paths:
+        st = os.stat(p)
+        stats[p] = st
+        entry = cache.get(p)
+        if (entry and entry["size"] == st.st_size and entry["mtime_ns"] == st.st_mtime_ns
+                and (blake3 is None or "blake3" in entry)):
+            hashes[p] = {k: entry[k] for k in ("sha256", "blake3") if k in entry}
+        else:
+            to_hash.append(p)
+
+    if to_hash:
+        with ThreadPoolExecutor(max_workers=min(8, len(to_hash))) as ex:
+            hashes.update(zip(to_hash, ex.map(_digest_file, to_hash)))
+        for p in to_hash:
+            st = stats[p]
+            cache[p] = {"size": st.st_size, "mtime_ns": st.st_mtime_ns, **hashes[p]}
+        _save_hash_cache(cache)
+
+    return hashes
+
+
 def scan_model_folders() -> list[Path]:
-    """models/ 폴더 내 모델 스캔 (ONNX 파일이 있는 폴더)"""
+    """models/ 폴더 내 모델 스캔 (ONNX 파일이 있는 폴더)
+
+    os.scandir는 readdir에서 얻은 타입 정보를 DirEntry에 캐시하므로
+    항목별 stat() 없이 is_dir() 판정이 되고, 필수 파일 확인도 폴더당
+    readdir 한 번으로 끝난다 (파일별 exists() stat 제거).
+    """
     model_folders = []
+    required = set(REQUIRED_FILES)
 
     # models 폴더가 없으면 생성
     MODELS_DIR.mkdir(exist_ok=True)
 
-    for item in MODELS_DIR.iterdir():
-        if item.is_dir():
-            # 필수 파일 체크
-            has_all_files = all((item / f).exists() for f in REQUIRED_FILES)
-            if has_all_files:
-                model_folders.append(item)
+    with os.scandir(MODELS_DIR) as it:
+        for entry in it:
+            if not entry.is_dir(follow_symlinks=False):
+                continue
+            # 필수 파일 체크 (폴더 목록 한 번 읽어서 집합 비교)
+            with os.scandir(entry.path) as files:
+                names = {e.name for e in files}
+            if required <= names:
+                model_folders.append(Path(entry.path))
 
     return model_folders
 
 
-def get_model_info(folder: Path, existing_models: dict) -> dict:
-    """모델 폴더에서 정보 추출"""
+def get_model_info(folder: Path, existing_models: dict, file_hashes: dict) -> dict:
+    """모델 폴더에서 정보 추출 (해시는 hash_model_files 결과 재사용)"""
     model_id = folder.name
 
     # 기존 모델 정보가 있으면 재사용
     existing = existing_models.get(model_id, {})
 
-    # 파일 정보 계산
+    # 파일 정보 계산 (sha256 + 설치 시 blake3) - 경로는 문자열로 조립
+    folder_str = str(folder)
     files = {}
     for filename in REQUIRED_FILES:
-        filepath = folder / filename
+        path_str = folder_str + os.sep + filename
         files[filename] = {
-            "size": filepath.stat().st_size,
-            "sha256": calculate_sha256(filepath)
+            "size": os.stat(path_str).st_size,
+            **file_hashes[path_str]
         }
 
     # 기존 정보가 있고 파일 해시가 같으면 기존 정보 유지
@@ -102,7 +232,8 @@ def update_readme(models: list):
     if not README_FILE.exists():
         return
 
-    content = README_FILE.read_text(encoding="utf-8")
+    # bytes로 읽고 쓰면 바뀌지 않는 99% 구간의 UTF-8 디코드/인코드를 건너뜀
+    content = README_FILE.read_bytes()
 
     # Models 테이블 생성
     table_lines = [
@@ -112,19 +243,33 @@ def update_readme(models: list):
         "|----|------|------|",
     ]
     for m in models:
-        size_mb = sum(f["size"] for f in m["files"].values()) / (1024 * 1024)
-        table_lines.append(f"| {m['id']} | {m['name']} | {size_mb:.1f}MB |")
+        table_lines.append(f"| {m['id']} | {m['name']} | {m['_total_mb']:.1f}MB |")
     table_lines.append("")
 
     # ## Models 부터 다음 ## 섹션 전까지 교체
-    pattern = r"## Models\n.*?(?=\n## )"
-    replacement = "\n".join(table_lines)
-    new_content = re.sub(pattern, replacement, content, flags=re.DOTALL)
+    # (DOTALL 정규식 역추적 대신 C 레벨 find 두 번 + 슬라이싱)
+    start = content.find(b"\n## Models")
+    if start < 0:
+        return
+    end = content.find(b"\n## ", start + 1)
+    if end < 0:
+        end = len(content)
+    table = "\n".join(table_lines).encode("utf-8")
 
-    README_FILE.write_text(new_content, encoding="utf-8")
+    README_FILE.write_bytes(content[:start + 1] + table + content[end:])
     print("README.md 업데이트 완료!")
 
 
+def _strip_private_keys(manifest: dict) -> dict:
+    """JSON 저장 전 '_' 접두사 내부 필드 제거 (모델 항목 포함)"""
+    out = {k: v for k, v in manifest.items() if not k.startswith("_")}
+    out["models"] = [
+        {k: v for k, v in m.items() if not k.startswith("_")}
+        for m in manifest.get("models", [])
+    ]
+    return out
+
+
 def update_models_json():
     """models.json 업데이트"""
     print("=" * 50)
@@ -147,6 +292,11 @@ def update_models_json():
     # 기존 모델을 dict로 변환 (id -> model)
     existing_models = {m["id"]: m for m in manifest.get("models", [])}
 
+    # 변경 감지용 스냅샷 (서명/키/타임스탬프 제외한 canonical bytes)
+    old_canonical = sign_manifest.canonical_json(
+        {k: v for k, v in manifest.items() if k not in ("signature", "key_id", "updated_at")}
+    )
+
     # 폴더 스캔
     folders = scan_model_folders()
 
@@ -162,39 +312,57 @@ def update_models_json():
 
     print(f"\n{len(folders)}개 모델 폴더 발견:\n")
 
+    # 전체 파일을 한 번에 병렬 해싱
+    file_hashes = hash_model_files(folders)
+
     # 각 폴더에서 모델 정보 추출
     new_models = []
     for folder in sorted(folders):
-        model_info = get_model_info(folder, existing_models)
+        model_info = get_model_info(folder, existing_models, file_hashes)
         new_models.append(model_info)
 
+    # 총 용량(MB)은 한 번만 계산 (README 테이블과 결과 출력에서 재사용)
+    for m in new_models:
+        m["_total_mb"] = sum(f["size"] for f in m["files"].values()) / 1048576.0
+
     # manifest 업데이트
     manifest["models"] = new_models
+
+    # 내용이 그대로면 저장/서명/README 갱신 전부 생략
+    # (updated_at도 유지되므로 git diff가 깨끗하게 남음)
+    # 단, 서명이 아직 없으면(키 없는 기여자가 돌려서 NEEDS_SIGNING으로
+    # 커밋한 경우 등) 내용이 같아도 계속 진행해서 서명을 채운다
+    new_canonical = sign_manifest.canonical_json(
+        {k: v for k, v in _strip_private_keys(manifest).items()
+         if k not in ("signature", "key_id", "updated_at")}
+    )
+    already_signed = manifest.get("signature") not in ("", "NEEDS_SIGNING", None)
+    if new_canonical == old_canonical and already_signed:
+        print("\n변경 없음 - models.json 그대로 유지")
+        return
+
     manifest["updated_at"] = datetime.now(timezone.utc).strftime("%Y-%m-%dT%H:%M:%SZ")
 
     # 서명 제거 (sign_manifest.py에서 다시 서명)
     manifest["signature"] = "NEEDS_SIGNING"
 
-    # 저장
+    # 저장 ('_' 내부 필드 제외)
+    # 이 파일은 곧바로 sign_manifest가 다시 읽어서 서명 후 indent=2로
+    # 재저장하므로, 중간 산출물은 compact로 써서 인덴터 비용을 생략
     with open(MODELS_JSON, "w", encoding="utf-8") as f:
-        json.dump(manifest, f, ensure_ascii=False, indent=2)
+        json.dump(_strip_private_keys(manifest), f, ensure_ascii=False, separators=(",", ":"))
 
     print("\n" + "=" * 50)
     print(f"models.json 업데이트 완료! ({len(new_models)}개 모델)")
     print("=" * 50)
 
-    # 서명 실행
+    # 서명 실행 (같은 프로세스에서 호출 - 키 객체 캐시도 재사용됨)
     print("\n서명 중...")
-    import subprocess
-    result = subprocess.run(
-        [sys.executable, str(Path(__file__).parent / "sign_manifest.py"), "--sign", str(MODELS_JSON)],
-        capture_output=True,
-        text=True
-    )
-    if result.returncode == 0:
+    try:
+        sign_manifest.sign_manifest(MODELS_JSON)
         print("서명 완료!")
-    else:
-        print(f"서명 실패: {result.stderr}")
+    except SystemExit:
+        print("서명 실패: scripts/keys/private_key.pem을 확인하세요.")
 
     # README.md 업데이트
     update_readme(new_models)
@@ -204,8 +372,7 @@ def update_models_json():
     print("등록된 모델 목록:")
     print("=" * 50)
     for m in new_models:
-        size_mb = sum(f["size"] for f in m["files"].values()) / (1024 * 1024)
-        print(f"  - {m['id']}: {m['name']} ({size_mb:.1f}MB, selector v{m['minimum_selector_version']}+)")
+        print(f"  - {m['id']}: {m['name']} ({m['_total_mb']:.1f}MB, selector v{m['minimum_selector_version']}+)")
 
 
 if __name__ == "__main__":